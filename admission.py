@@ -0,0 +1,144 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+
+class Overloaded(Exception):
+    """Raised when a workload class is saturated and the request is shed."""
+
+    def __init__(self, workload: str, retry_after: int):
+        super().__init__(f"{workload} workload is overloaded, retry in {retry_after}s")
+        self.workload = workload
+        self.retry_after = retry_after
+
+class WorkloadClass:
+    """
+    Concurrency limit plus a bounded wait queue for one class of requests.
+
+    The limit adapts to observed latency (AIMD): it grows by about one slot per
+    window of fast requests and shrinks by 10% whenever a request runs past the
+    target latency, never leaving [min_limit, max_limit].
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float,
+                 target_latency: float, min_limit: int = 1, max_limit: int = None):
+        self.name = name
+        self.limit = float(limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit * 2
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.active = 0
+        self.latency_ewma = target_latency / 2
+        self.admitted = 0
+        self.shed = 0
+        self._waiters = deque()
+
+    def _retry_after(self) -> int:
+        """Rough time until a queued request would get a slot."""
+        backlog = (len(self._waiters) + 1) / max(1.0, self.limit)
+        return max(1, math.ceil(self.latency_ewma * backlog))
+
+    def _shed(self) -> Overloaded:
+        self.shed += 1
+        return Overloaded(self.name, self._retry_after())
+
+    async def acquire(self):
+        if self.active < int(self.limit) and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._shed()
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        # asyncio.wait, unlike wait_for, never swallows a cancellation that lands
+        # in the same step as the slot being handed over
+        try:
+            await asyncio.wait({fut}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(fut)
+            raise
+        if not fut.done():
+            self._abandon(fut)
+            raise self._shed()
+        if asyncio.current_task().cancelling():
+            # Cancelled while being admitted: give the slot back instead of starting work
+            self.release(None)
+            raise asyncio.CancelledError()
+        self.admitted += 1
+
+    def _abandon(self, fut: asyncio.Future):
+        """Clean up a waiter that gave up; return its slot if one was already handed over."""
+        if fut.done() and not fut.cancelled():
+            self.release(None)
+        elif fut in self._waiters:
+            self._waiters.remove(fut)
+
+    def release(self, latency: float = None):
+        self.active -= 1
+        if latency is not None:
+            self._observe(latency)
+        # Hand free slots straight to queued requests, oldest first
+        while self._waiters and self.active < int(self.limit):
+            fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            self.active += 1
+            fut.set_result(None)
+
+    def _observe(self, latency: float):
+        self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * latency
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "latency_ewma": round(self.latency_ewma, 3),
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+class AdmissionController:
+    """Admission control with a separate limit and queue per workload class."""
+
+    def __init__(self, classes: Dict[str, WorkloadClass]):
+        self.classes = classes
+
+    def admit(self, workload: str):
+        """Async context manager holding a slot in the given workload class."""
+        return self.classes[workload].slot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: workload.stats() for name, workload in self.classes.items()}
+
+# Workload classes: cheap local work, chart rendering, long graph analyses,
+# Gemini calls and web scraping
+admission = AdmissionController({
+    "local": WorkloadClass("local", limit=32, max_queue=128, queue_timeout=2, target_latency=0.5),
+    # Charts render on a single thread (pyplot is not thread-safe)
+    "chart": WorkloadClass("chart", limit=1, max_limit=1, max_queue=32, queue_timeout=10, target_latency=5),
+    # One graph job at a time: each already spreads over every CPU core
+    "graph": WorkloadClass("graph", limit=1, max_limit=1, max_queue=4, queue_timeout=30, target_latency=300),
+    "llm": WorkloadClass("llm", limit=8, max_queue=32, queue_timeout=5, target_latency=30, max_limit=16),
+    "scrape": WorkloadClass("scrape", limit=2, max_queue=8, queue_timeout=5, target_latency=15),
+})
@@ -0,0 +1,274 @@
+import math
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import networkx as nx
+
+# Accuracy presets: target absolute error of normalized betweenness / clustering
+ACCURACY_EPSILON = {"fast": 0.1, "balanced": 0.05, "high": 0.02}
+# Below this many sources the BFS work is not worth spreading over processes
+PARALLEL_MIN_SOURCES = 64
+
+def to_csr(G: nx.Graph) -> Tuple[List[Any], np.ndarray, np.ndarray]:
+    """Nodes plus CSR adjacency (indptr, sorted indices) of an undirected graph, without self-loops."""
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    edges = np.array([(index[u], index[v]) for u, v in G.edges() if u != v], dtype=np.int64).reshape(-1, 2)
+    src = np.concatenate([edges[:, 0], edges[:, 1]])
+    dst = np.concatenate([edges[:, 1], edges[:, 0]])
+    order = np.lexsort((dst, src))
+    src, dst = src[order], dst[order]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return nodes, indptr, dst
+
+def connected_components(n: int, indptr: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Component label per node, via union-find with path halving and union by size."""
+    parent = list(range(n))
+    size = [1] * n
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    src = np.repeat(np.arange(n), np.diff(indptr))
+    for u, v in zip(src.tolist(), indices.tolist()):
+        if u < v:
+            ru, rv = find(u), find(v)
+            if ru != rv:
+                if size[ru] < size[rv]:
+                    ru, rv = rv, ru
+                parent[rv] = ru
+                size[ru] += size[rv]
+    return np.array([find(x) for x in range(n)], dtype=np.int64)
+
+def _expand(frontier: np.ndarray, indptr: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """All (parent, neighbor) pairs leaving the frontier."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = counts.sum()
+    parents = np.repeat(frontier, counts)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return parents, indices[offsets]
+
+def single_source(source: int, indptr: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Level-synchronous BFS from one source with Brandes dependency accumulation.
+    Returns (distances, dependencies); unreachable nodes have distance -1.
+    """
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int64)
+    sigma = np.zeros(n, dtype=np.float64)
+    dist[source] = 0
+    sigma[source] = 1.0
+    frontier = np.array([source], dtype=np.int64)
+    levels = []
+    level = 0
+    while len(frontier):
+        parents, children = _expand(frontier, indptr, indices)
+        unseen = dist[children] == -1
+        dist[children[unseen]] = level + 1
+        tree = dist[children] == level + 1
+        parents, children = parents[tree], children[tree]
+        np.add.at(sigma, children, sigma[parents])
+        levels.append((parents, children))
+        frontier = np.unique(children)
+        level += 1
+
+    delta = np.zeros(n, dtype=np.float64)
+    for parents, children in reversed(levels):
+        np.add.at(delta, parents, sigma[parents] / sigma[children] * (1.0 + delta[children]))
+    delta[source] = 0.0
+    return dist, delta
+
+# Graph shared with pool workers, set once per process by the initializer
+_worker_graph = None
+
+def _init_worker(indptr: np.ndarray, indices: np.ndarray):
+    global _worker_graph
+    _worker_graph = (indptr, indices)
+
+def _process_sources(sources: List[int], graph=None) -> Dict[str, Any]:
+    """Partial sums over a batch of sources, mergeable across workers."""
+    indptr, indices = graph if graph is not None else _worker_graph
+    n = len(indptr) - 1
+    dependency = np.zeros(n, dtype=np.float64)
+    distance_sum = np.zeros(n, dtype=np.float64)
+    eccentricity = {}
+    farthest = {}
+    for s in sources:
+        dist, delta = single_source(s, indptr, indices)
+        dependency += delta
+        reached = dist > 0
+        distance_sum[reached] += dist[reached]
+        eccentricity[s] = int(dist.max())
+        farthest[s] = int(dist.argmax())
+    return {"dependency": dependency, "distance_sum": distance_sum,
+            "eccentricity": eccentricity, "farthest": farthest}
+
+def _run_sources(sources: List[int], indptr: np.ndarray, indices: np.ndarray, workers: int) -> Dict[str, Any]:
+    """Run all sampled sources, spread over worker processes when worthwhile."""
+    if workers <= 1 or len(sources) < PARALLEL_MIN_SOURCES:
+        return _process_sources(sources, (indptr, indices))
+    batches = [sources[i::workers] for i in range(workers)]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(indptr, indices)) as pool:
+        parts = list(pool.map(_process_sources, batches))
+    merged = parts[0]
+    for part in parts[1:]:
+        merged["dependency"] += part["dependency"]
+        merged["distance_sum"] += part["distance_sum"]
+        merged["eccentricity"].update(part["eccentricity"])
+        merged["farthest"].update(part["farthest"])
+    return merged
+
+def sample_size(n: int, epsilon: float, delta: float) -> int:
+    """Sources needed for an absolute error <= epsilon on every node with probability 1 - delta (Hoeffding + union bound)."""
+    return min(n, math.ceil(math.log(2 * n / delta) / (2 * epsilon ** 2)))
+
+def hoeffding_error(n_bound: int, samples: int, delta: float) -> float:
+    return math.sqrt(math.log(2 * n_bound / delta) / (2 * samples))
+
+def _top(nodes: List[Any], values: np.ndarray, k: int = 10,
+         intervals: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> List[Dict[str, Any]]:
+    order = np.argsort(-np.nan_to_num(values, nan=-np.inf), kind='stable')[:k]
+    top = []
+    for i in order:
+        if np.isnan(values[i]):
+            continue
+        entry = {"node": nodes[i], "value": float(values[i])}
+        if intervals is not None:
+            entry["interval"] = [float(intervals[0][i]), float(intervals[1][i])]
+        top.append(entry)
+    return top
+
+def _average_clustering(indptr: np.ndarray, indices: np.ndarray, samples: int, rng: np.random.Generator) -> float:
+    """Wedge-sampling estimate of the average clustering coefficient (degree < 2 counts as 0)."""
+    n = len(indptr) - 1
+    degree = np.diff(indptr)
+    hits = 0
+    for v in rng.integers(0, n, size=samples):
+        if degree[v] < 2:
+            continue
+        a, b = rng.choice(degree[v], size=2, replace=False)
+        u, w = indices[indptr[v] + a], indices[indptr[v] + b]
+        row = indices[indptr[u]:indptr[u + 1]]
+        pos = np.searchsorted(row, w)
+        hits += pos < len(row) and row[pos] == w
+    return hits / samples
+
+def extended_metrics(G: nx.Graph, accuracy: str = "balanced", samples: Optional[int] = None,
+                     delta: float = 0.1, workers: Optional[int] = None, seed: int = 42) -> Dict[str, Any]:
+    """
+    Approximate centrality, component, diameter and clustering metrics for large graphs.
+
+    Betweenness and closeness come from BFS/Brandes passes over a uniform sample of
+    sources (exact when every node is a source); the reported error bounds hold for
+    all nodes simultaneously with probability 1 - delta.
+    """
+    if accuracy != "exact" and accuracy not in ACCURACY_EPSILON:
+        raise ValueError(f"accuracy must be one of: exact, {', '.join(ACCURACY_EPSILON)}")
+    nodes, indptr, indices = to_csr(G)
+    n = len(nodes)
+    if n < 3:
+        raise ValueError("Extended metrics need at least 3 nodes")
+    rng = np.random.default_rng(seed)
+    workers = workers or os.cpu_count() or 1
+
+    if samples is None:
+        samples = n if accuracy == "exact" else sample_size(n, ACCURACY_EPSILON[accuracy], delta)
+    samples = max(1, min(int(samples), n))
+    exact = samples == n
+    sources = sorted(rng.choice(n, size=samples, replace=False).tolist())
+
+    # Components via union-find
+    labels = connected_components(n, indptr, indices)
+    comp_ids, comp_sizes = np.unique(labels, return_counts=True)
+    size_of = dict(zip(comp_ids.tolist(), comp_sizes.tolist()))
+    largest = int(comp_ids[comp_sizes.argmax()])
+
+    # Make sure the largest component has a source so its diameter can be bounded
+    if not any(labels[s] == largest for s in sources):
+        sources[0] = int(np.flatnonzero(labels == largest)[0])
+    partial = _run_sources(sources, indptr, indices, workers)
+
+    # Betweenness: n/k scaling, halved for undirected graphs, normalized like NetworkX
+    scale = n / len(sources)
+    betweenness = partial["dependency"] * scale / 2 * (2 / ((n - 1) * (n - 2)))
+
+    # Closeness (Wasserman-Faust, as NetworkX): mean distance estimated from sources in the same component
+    node_sizes = np.array([size_of[l] for l in labels.tolist()], dtype=np.float64)
+    sources_in = np.bincount(np.searchsorted(comp_ids, labels[sources]), minlength=len(comp_ids))
+    node_samples = sources_in[np.searchsorted(comp_ids, labels)].astype(np.float64)
+    node_samples[sources] -= 1  # a source does not measure its distance to itself
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_distance = partial["distance_sum"] / node_samples
+        closeness = np.where(node_samples > 0, (node_sizes - 1) / (n - 1) / mean_distance, np.nan)
+    closeness[node_sizes == 1] = 0.0
+
+    # Diameter of the largest component: sampled eccentricities plus a double sweep
+    ecc = {s: e for s, e in partial["eccentricity"].items() if labels[s] == largest}
+    lower = max(ecc.values())
+    start = max(ecc, key=ecc.get)
+    sweep = _process_sources([partial["farthest"][start]], (indptr, indices))
+    lower = max(lower, max(sweep["eccentricity"].values()))
+    upper = min(2 * e for e in ecc.values())
+    if exact:
+        upper = lower
+
+    # Closeness error per node: Hoeffding on the sources sampled in its own component,
+    # with distances bounded by that component's diameter (at most 2x any source's
+    # eccentricity, and size - 1)
+    comp_range = comp_sizes.astype(np.float64) - 1
+    for s, e in partial["eccentricity"].items():
+        c = np.searchsorted(comp_ids, labels[s])
+        comp_range[c] = min(comp_range[c], 2 * e)
+    node_range = comp_range[np.searchsorted(comp_ids, labels)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distance_error = node_range * np.sqrt(math.log(2 * n / delta) / (2 * node_samples))
+    estimated = (node_samples > 0) & (node_sizes > 1)
+    if exact:
+        distance_error[:] = 0.0
+    distance_error[node_sizes == 1] = 0.0
+    # Carry the mean distance bound over to closeness (a mean distance is at least 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        closeness_scale = (node_sizes - 1) / (n - 1)
+        closeness_low = closeness_scale / (mean_distance + distance_error)
+        closeness_high = closeness_scale / np.maximum(mean_distance - distance_error, 1.0)
+    closeness_low[node_sizes == 1] = closeness_high[node_sizes == 1] = 0.0
+
+    if exact:
+        clustering_samples = n
+        clustering = nx.average_clustering(G)
+    else:
+        # A single estimate, so no union bound over nodes is needed
+        clustering_samples = math.ceil(math.log(2 / delta) / (2 * ACCURACY_EPSILON[accuracy] ** 2))
+        clustering = _average_clustering(indptr, indices, clustering_samples, rng)
+
+    betweenness_error = 0.0 if exact else hoeffding_error(n, len(sources), delta) * n / (n - 1)
+    return {
+        "accuracy": accuracy,
+        "sampled_sources": len(sources),
+        "exact": exact,
+        "confidence": 1 - delta,
+        "workers": workers if len(sources) >= PARALLEL_MIN_SOURCES else 1,
+        "connected_components": len(comp_ids),
+        "largest_component_size": int(comp_sizes.max()),
+        "top_betweenness": _top(nodes, betweenness),
+        "betweenness_error": betweenness_error,
+        # Each entry carries the closeness interval implied by its mean distance bound
+        "top_closeness": _top(nodes, closeness, intervals=(closeness_low, closeness_high)),
+        # Worst of those bounds over every node with a closeness estimate
+        "closeness_mean_distance_error": float(distance_error[estimated].max()) if estimated.any() else 0.0,
+        "diameter_lower": int(lower),
+        "diameter_upper": int(upper),
+        "average_clustering": float(clustering),
+        "clustering_error": 0.0 if exact else hoeffding_error(1, clustering_samples, delta),
+    }
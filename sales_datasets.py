@@ -0,0 +1,213 @@
+import heapq
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import render_sales_bar_chart, render_cumulative_sales_chart, read_table_bytes
+
+REQUIRED_COLUMNS = ('Date', 'Region', 'Sales')
+
+# Registry bounds: datasets idle for longer than the TTL are dropped, and past
+# the cap the least recently used one goes first
+SALES_DATASETS_MAX = int(os.getenv("SALES_DATASETS_MAX", "1000"))
+SALES_DATASET_TTL_SECONDS = float(os.getenv("SALES_DATASET_TTL_SECONDS", str(24 * 3600)))
+
+def parse_sales_rows(data: bytes, filename: str = "") -> pd.DataFrame:
+    """Parse a batch of sales rows (CSV, compressed CSV, Parquet or Arrow) the same way analyze_sales_csv does."""
+    df = read_table_bytes(data, filename, columns=list(REQUIRED_COLUMNS))
+    df.columns = df.columns.str.strip()
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    try:
+        df['Sales'] = pd.to_numeric(df['Sales'])
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Sales must be numeric: {e}") from e
+    if np.isinf(df['Sales']).any():
+        raise ValueError("Sales must be finite")
+    df['Date'] = pd.to_datetime(df['Date'])
+    # A blank Sales cell adds nothing to any metric (pandas skips NaN), so drop the row;
+    # blank dates and regions are skipped per metric in SalesDataset.append
+    return df.dropna(subset=['Sales'])
+
+class RunningMedian:
+    """Exact streaming median with two heaps (O(log n) per insert)."""
+
+    def __init__(self):
+        self._low = []   # max-heap of the lower half (stored negated)
+        self._high = []  # min-heap of the upper half
+
+    def add(self, value: float):
+        if self._low and value > -self._low[0]:
+            heapq.heappush(self._high, value)
+        else:
+            heapq.heappush(self._low, -value)
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def median(self) -> float:
+        if not self._low:
+            return float('nan')
+        if len(self._low) > len(self._high):
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2
+
+class CoMoments:
+    """Mergeable count/means/co-moments for a Pearson correlation (Chan et al.)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.m2_x = 0.0
+        self.m2_y = 0.0
+        self.c_xy = 0.0
+
+    def merge(self, x: np.ndarray, y: np.ndarray):
+        """Fold a batch of (x, y) pairs into the running moments."""
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mean_x_b, mean_y_b = x.mean(), y.mean()
+        dx_b, dy_b = x - mean_x_b, y - mean_y_b
+        m2_x_b, m2_y_b, c_xy_b = np.dot(dx_b, dx_b), np.dot(dy_b, dy_b), np.dot(dx_b, dy_b)
+
+        n = self.n + n_b
+        delta_x = mean_x_b - self.mean_x
+        delta_y = mean_y_b - self.mean_y
+        weight = self.n * n_b / n
+        self.m2_x += m2_x_b + delta_x * delta_x * weight
+        self.m2_y += m2_y_b + delta_y * delta_y * weight
+        self.c_xy += c_xy_b + delta_x * delta_y * weight
+        self.mean_x += delta_x * n_b / n
+        self.mean_y += delta_y * n_b / n
+        self.n = n
+
+    def correlation(self) -> Optional[float]:
+        """Pearson correlation, or None when it is undefined (NaN is not valid JSON)."""
+        if self.n < 2 or self.m2_x <= 0 or self.m2_y <= 0:
+            return None
+        return float(self.c_xy / np.sqrt(self.m2_x * self.m2_y))
+
+class SalesDataset:
+    """
+    Sales history kept as mergeable aggregates, so appending rows costs O(delta)
+    instead of re-parsing and recomputing the whole history.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.lock = threading.Lock()
+        self.row_count = 0
+        self.total_sales = 0.0
+        self.region_totals: Dict[str, float] = {}
+        self.day_sales = CoMoments()
+        self.median = RunningMedian()
+        # Rows kept sorted by date with their running cumulative sales
+        self._dates = []
+        self._sales = []
+        self._cumulative = []
+
+    def append(self, df: pd.DataFrame):
+        """Fold a batch of parsed rows into the aggregates, skipping missing values per metric like pandas."""
+        # Derive everything from the batch before touching any aggregate, so a bad
+        # batch leaves the dataset as it was
+        sales = df['Sales'].to_numpy(dtype=float)
+        if not np.isfinite(sales).all():
+            raise ValueError("Sales must be finite and not blank")
+        dated = df['Date'].notna().to_numpy()
+        region_totals = df.groupby('Region')['Sales'].sum()
+        days = df['Date'].dt.day.to_numpy(dtype=float)[dated]
+        dates = df['Date'].to_numpy()[dated]
+
+        self.row_count += len(df)
+        self.total_sales += float(sales.sum())
+        for region, total in region_totals.items():
+            self.region_totals[region] = self.region_totals.get(region, 0.0) + float(total)
+        self.day_sales.merge(days, sales[dated])
+        for value in sales:
+            self.median.add(value)
+        self._extend_cumulative(dates, sales[dated])
+
+    def _extend_cumulative(self, dates: np.ndarray, sales: np.ndarray):
+        """Insert rows into the date-ordered cumulative series, touching only the affected suffix."""
+        order = np.argsort(dates, kind='stable')
+        first_changed = len(self._dates)
+        for date, value in zip(dates[order], sales[order]):
+            pos = bisect_right(self._dates, date)
+            self._dates.insert(pos, date)
+            self._sales.insert(pos, value)
+            self._cumulative.insert(pos, 0.0)
+            first_changed = min(first_changed, pos)
+        running = self._cumulative[first_changed - 1] if first_changed > 0 else 0.0
+        for i in range(first_changed, len(self._dates)):
+            running += self._sales[i]
+            self._cumulative[i] = running
+
+    def top_region(self) -> Optional[str]:
+        # Same tie-break as groupby().sum().idxmax(): first region in sorted order
+        if not self.region_totals:
+            return None
+        regions = sorted(self.region_totals)
+        return max(regions, key=lambda r: self.region_totals[r])
+
+    def summary(self, charts: bool = True) -> Dict[str, Any]:
+        """Metrics in the same shape as analyze_sales_csv."""
+        result = {
+            "dataset_id": self.id,
+            "row_count": self.row_count,
+            "total_sales": int(self.total_sales),
+            "top_region": self.top_region(),
+            "day_sales_correlation": self.day_sales.correlation(),
+            "median_sales": int(self.median.median()) if self.row_count else None,
+            "total_sales_tax": int(self.total_sales * 0.1),
+        }
+        if charts and self.row_count:
+            result["bar_chart"] = render_sales_bar_chart(pd.Series(self.region_totals).sort_index())
+            result["cumulative_sales_chart"] = render_cumulative_sales_chart(self._dates, self._cumulative)
+        return result
+
+# In-memory registry of live datasets, least recently used first, with last access times
+_datasets: "OrderedDict[str, SalesDataset]" = OrderedDict()
+_last_access: Dict[str, float] = {}
+_registry_lock = threading.Lock()
+
+def _evict(now: float):
+    """Drop expired datasets, then the least recently used ones beyond the cap (lock held)."""
+    while _datasets:
+        oldest = next(iter(_datasets))
+        if now - _last_access[oldest] <= SALES_DATASET_TTL_SECONDS and len(_datasets) <= SALES_DATASETS_MAX:
+            break
+        del _datasets[oldest]
+        del _last_access[oldest]
+
+def register_dataset(dataset: SalesDataset):
+    now = time.monotonic()
+    with _registry_lock:
+        _datasets[dataset.id] = dataset
+        _last_access[dataset.id] = now
+        _evict(now)
+
+def get_dataset(dataset_id: str) -> Optional[SalesDataset]:
+    now = time.monotonic()
+    with _registry_lock:
+        _evict(now)
+        dataset = _datasets.get(dataset_id)
+        if dataset is not None:
+            _datasets.move_to_end(dataset_id)
+            _last_access[dataset_id] = now
+        return dataset
+
+def delete_dataset(dataset_id: str) -> bool:
+    with _registry_lock:
+        _last_access.pop(dataset_id, None)
+        return _datasets.pop(dataset_id, None) is not None
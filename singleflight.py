@@ -0,0 +1,67 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+def request_fingerprint(*parts) -> str:
+    """Stable fingerprint of a request from its parts (str or bytes)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        elif not isinstance(part, bytes):
+            part = repr(part).encode('utf-8')
+        # Length prefix keeps ("ab", "c") and ("a", "bc") apart
+        digest.update(len(part).to_bytes(8, 'big'))
+        digest.update(part)
+    return digest.hexdigest()
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller runs the work,
+    duplicates arriving while it is in flight await the same task and get the
+    same result or exception. A waiter can be cancelled without affecting the
+    others; the shared work is cancelled only when every waiter has gone.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0 and not task.done():
+                    # Forget the key now so callers arriving during cancellation start fresh
+                    del self._tasks[key]
+                    del self._waiters[key]
+                    task.cancel()
+            raise
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            del self._waiters[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
+
+# Shared coalescing layer for the app
+single_flight = SingleFlight()
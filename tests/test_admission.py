@@ -0,0 +1,59 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from admission import WorkloadClass, Overloaded
+
+def test_cancelled_waiter_handed_a_slot_does_not_run():
+    async def scenario():
+        workload = WorkloadClass("test", limit=1, max_limit=1, max_queue=4, queue_timeout=5, target_latency=1)
+        started = []
+
+        async def request():
+            async with workload.slot():
+                started.append(True)
+
+        await workload.acquire()
+        waiter = asyncio.ensure_future(request())
+        await asyncio.sleep(0)
+        assert workload.stats()["queued"] == 1
+        # The slot is handed over and the waiter cancelled in the same step
+        workload.release(0.0)
+        waiter.cancel()
+        results = await asyncio.gather(waiter, return_exceptions=True)
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert started == []
+        assert workload.active == 0
+        assert workload.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+def test_cancelled_queued_waiter_leaves_the_queue():
+    async def scenario():
+        workload = WorkloadClass("test", limit=1, max_limit=1, max_queue=4, queue_timeout=5, target_latency=1)
+        await workload.acquire()
+        waiter = asyncio.ensure_future(workload.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert workload.stats()["queued"] == 0
+        workload.release(0.0)
+        assert workload.active == 0
+
+    asyncio.run(scenario())
+
+def test_queued_waiter_is_shed_after_timeout():
+    async def scenario():
+        workload = WorkloadClass("test", limit=1, max_limit=1, max_queue=4, queue_timeout=0.01, target_latency=1)
+        await workload.acquire()
+        with pytest.raises(Overloaded):
+            await workload.acquire()
+        assert workload.active == 1
+        assert workload.stats()["queued"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GEMINI_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+
+from gemini_cache import normalize_prompt, cache_key
+
+def test_normalize_prompt_keeps_line_structure():
+    assert normalize_prompt("a,b\n1,2\n3,4") != normalize_prompt("a,b 1,2 3,4")
+    assert normalize_prompt("key:\n  nested: 1") == "key:\n  nested: 1"
+
+def test_normalize_prompt_ignores_trivial_differences():
+    assert normalize_prompt("\r\n\ncafé  \r\nnext\t\n\n") == "café\nnext"
+    assert cache_key("m", "q\r\n") == cache_key("m", "q")
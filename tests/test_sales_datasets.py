@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # main.py mounts static/ and templates/ relative to the working directory
+os.environ.setdefault("GEMINI_CACHE_PATH", os.path.join(tempfile.mkdtemp(), "cache.sqlite3"))
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from fastapi.testclient import TestClient
+
+import main
+import sales_datasets
+
+client = TestClient(main.app)
+
+@pytest.mark.parametrize("body", [
+    b"",
+    b"Date,Region,Sales\n2024-01-01,North,100\n",
+    b"Date,Region,Sales\n2024-01-05,North,100\n2024-02-05,South,150\n2024-03-05,East,120\n",
+])
+def test_create_with_undefined_correlation(body):
+    response = client.post("/api/datasets/sales?charts=false", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["day_sales_correlation"] is None
+    assert sales_datasets.get_dataset(result["dataset_id"]) is not None
+
+def test_correlation_defined_after_append():
+    created = client.post("/api/datasets/sales", content=b"").json()
+    response = client.post(
+        f"/api/datasets/sales/{created['dataset_id']}/rows",
+        content=b"Date,Region,Sales\n2024-01-01,North,100\n2024-01-02,South,150\n2024-01-03,East,90\n",
+    )
+    assert response.status_code == 200
+    assert response.json()["day_sales_correlation"] is not None
+
+def test_invalid_rows_are_not_registered():
+    before = len(sales_datasets._datasets)
+    response = client.post("/api/datasets/sales", content=b"Date,Sales\n2024-01-01,100\n")
+    assert response.status_code == 400
+    assert len(sales_datasets._datasets) == before
+
+def test_appends_skip_charts_by_default():
+    created = client.post("/api/datasets/sales?charts=false", content=b"").json()
+    url = f"/api/datasets/sales/{created['dataset_id']}/rows"
+    rows = b"Date,Region,Sales\n2024-01-01,North,100\n"
+    assert "cumulative_sales_chart" not in client.post(url, content=rows).json()
+    assert "cumulative_sales_chart" in client.post(url + "?charts=true", content=rows).json()
+
+def test_registry_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(sales_datasets, "SALES_DATASETS_MAX", 2)
+    first, second, third = (sales_datasets.SalesDataset() for _ in range(3))
+    sales_datasets.register_dataset(first)
+    sales_datasets.register_dataset(second)
+    sales_datasets.get_dataset(first.id)
+    sales_datasets.register_dataset(third)
+    assert sales_datasets.get_dataset(second.id) is None
+    assert sales_datasets.get_dataset(first.id) is first
+    assert sales_datasets.get_dataset(third.id) is third
+
+def test_registry_expires_idle_datasets(monkeypatch):
+    dataset = sales_datasets.SalesDataset()
+    sales_datasets.register_dataset(dataset)
+    monkeypatch.setattr(sales_datasets, "SALES_DATASET_TTL_SECONDS", -1)
+    assert sales_datasets.get_dataset(dataset.id) is None
+
+def test_blank_cells_are_skipped():
+    created = client.post("/api/datasets/sales?charts=false",
+                          content=b"Date,Region,Sales\n2024-01-01,North,100\n2024-01-02,South,150\n").json()
+    url = f"/api/datasets/sales/{created['dataset_id']}"
+    response = client.post(url + "/rows", content=b"Date,Region,Sales\n2024-01-04,North,\n,East,50\n")
+    assert response.status_code == 200
+    assert response.json()["total_sales"] == 300
+    assert client.get(url).status_code == 200
+
+def test_non_numeric_sales_are_rejected():
+    created = client.post("/api/datasets/sales?charts=false",
+                          content=b"Date,Region,Sales\n2024-01-01,North,100\n").json()
+    url = f"/api/datasets/sales/{created['dataset_id']}"
+    response = client.post(url + "/rows", content=b"Date,Region,Sales\n2024-01-02,South,lots\n")
+    assert response.status_code == 400
+    assert client.get(url + "?charts=false").json()["total_sales"] == 100
+
+def test_incremental_matches_full_recompute():
+    rng = np.random.default_rng(7)
+    def day():
+        return f"2024-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}"
+
+    rows = [f"{day()},{region},{rng.integers(10, 500)}" for region in ("North", "South") for _ in range(25)]
+    # East and West get the same sales on different dates, so they tie for top region
+    east = [int(v) for v in rng.integers(500, 900, size=25)]
+    rows += [f"{day()},East,{v}" for v in east] + [f"{day()},West,{v}" for v in east]
+    # Blank cells are skipped per metric
+    rows += ["2024-07-01,North,", ",South,40", "2024-07-02,,60"]
+    rows = [rows[i] for i in rng.permutation(len(rows))]
+    header = "Date,Region,Sales"
+
+    created = client.post("/api/datasets/sales?charts=false", content=b"").json()
+    url = f"/api/datasets/sales/{created['dataset_id']}/rows"
+    for batch in np.array_split(np.arange(len(rows)), 6):
+        body = "\n".join([header] + [rows[i] for i in batch]) + "\n"
+        assert client.post(url, content=body.encode()).status_code == 200
+    incremental = client.get(f"/api/datasets/sales/{created['dataset_id']}?charts=false").json()
+
+    full = main.analyze_sales_csv("\n".join([header] + rows) + "\n")
+    assert incremental["total_sales"] == full["total_sales"]
+    assert incremental["top_region"] == full["top_region"] == "East"
+    assert incremental["median_sales"] == full["median_sales"]
+    assert incremental["day_sales_correlation"] == pytest.approx(full["day_sales_correlation"])
@@ -5,9 +5,13 @@ import pandas as pd
 import requests
 import duckdb
 import matplotlib.pyplot as plt
-import seaborn as sns
+import numpy as np
 import io
 import base64
+import gzip
+import time
+from typing import List, Optional
+from gemini_cache import response_cache
 
 # Load environment variables
 load_dotenv()
@@ -15,16 +19,25 @@ load_dotenv()
 # Configure Google Gemini API
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 
-def ask_gemini(prompt: str, model: str = "gemini-1.5-flash") -> str:
+def ask_gemini(prompt: str, model: str = "gemini-1.5-flash", use_cache: bool = True, refresh: bool = False) -> str:
     """
     Send a prompt to Google's Gemini model and return the response text.
+    Successful answers are cached per model and normalized prompt.
     """
+    if use_cache and not refresh:
+        cached = response_cache.get(model, prompt)
+        if cached is not None:
+            return cached
     try:
+        start = time.perf_counter()
         model_client = genai.GenerativeModel(model)
         response = model_client.generate_content(prompt)
-        return response.text.strip()
+        text = response.text.strip()
     except Exception as e:
         return f"❌ Error: {str(e)}"
+    if use_cache:
+        response_cache.set(model, prompt, text, time.perf_counter() - start)
+    return text
 
 def scrape_tables_from_url(url: str) -> pd.DataFrame:
     """
@@ -53,33 +66,177 @@ def run_sql_on_dataframe(df: pd.DataFrame, sql_query: str) -> any:
     finally:
         con.close()
 
-def generate_scatterplot_base64(df: pd.DataFrame, x_col: str, y_col: str, regression_line: bool = False) -> str:
+# Magic bytes and filename suffixes used to detect uploaded table formats
+_MAGIC_BYTES = [
+    (b'PAR1', 'parquet'),
+    (b'ARROW1', 'arrow'),
+    (b'FEA1', 'arrow'),
+    (b'\xff\xff\xff\xff', 'arrow_stream'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+_SUFFIXES = [
+    ('.parquet', 'parquet'),
+    ('.feather', 'arrow'),
+    ('.arrow', 'arrow'),
+    ('.ipc', 'arrow'),
+    ('.arrows', 'arrow_stream'),
+    ('.gz', 'gzip'),
+    ('.zst', 'zstd'),
+]
+DATA_FILE_SUFFIXES = ('.csv',) + tuple(suffix for suffix, _ in _SUFFIXES)
+COLUMNAR_FORMATS = ('parquet', 'arrow', 'arrow_stream')
+
+def detect_table_format(data: bytes, filename: str = "") -> str:
     """
-    Generate a scatterplot with optional regression line and return it as a base64 encoded PNG.
+    Detect an uploaded table's format from its magic bytes, falling back to the filename.
+    Returns one of 'parquet', 'arrow', 'arrow_stream', 'gzip', 'zstd' or 'csv'.
+    """
+    for magic, fmt in _MAGIC_BYTES:
+        if data.startswith(magic):
+            return fmt
+    name = (filename or "").lower()
+    for suffix, fmt in _SUFFIXES:
+        if name.endswith(suffix):
+            return fmt
+    return 'csv'
+
+def _project(names: List[str], columns: Optional[List[str]]) -> Optional[List[str]]:
+    """Stored column names matching the wanted columns (ignoring surrounding whitespace)."""
+    if columns is None:
+        return None
+    return [name for name in names if str(name).strip() in columns]
+
+def read_table_bytes(data: bytes, filename: str = "", columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Read an uploaded table (CSV, gzip/zstd CSV, Parquet or Arrow IPC/Feather) into a DataFrame,
+    loading only the requested columns when given.
+    """
+    fmt = detect_table_format(data, filename)
+    if fmt in COLUMNAR_FORMATS:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.feather
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Reading Parquet/Arrow uploads requires pyarrow")
+        # BufferReader wraps the upload without copying it
+        source = pyarrow.BufferReader(data)
+        if fmt == 'parquet':
+            parquet_file = pyarrow.parquet.ParquetFile(source)
+            table = parquet_file.read(columns=_project(parquet_file.schema_arrow.names, columns))
+        else:
+            if fmt == 'arrow':
+                table = pyarrow.feather.read_table(source, memory_map=False)
+            else:
+                table = pyarrow.ipc.open_stream(source).read_all()
+            if columns is not None:
+                table = table.select(_project(table.column_names, columns))
+        return table.to_pandas()
+
+    # CSV, decompressed as a stream by pandas when compressed
+    compression = fmt if fmt in ('gzip', 'zstd') else None
+    usecols = (lambda name: name.strip() in columns) if columns is not None else None
+    return pd.read_csv(io.BytesIO(data), compression=compression, usecols=usecols)
+
+def read_text_bytes(data: bytes, filename: str = "") -> str:
     """
+    Decode an uploaded text file, transparently decompressing gzip or zstd.
+    """
+    fmt = detect_table_format(data, filename)
+    if fmt == 'gzip':
+        data = gzip.decompress(data)
+    elif fmt == 'zstd':
+        import zstandard
+        with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+            data = reader.read()
+    return data.decode('utf-8')
+
+# Above this many points the scatter is drawn as a hexbin density instead
+HEXBIN_THRESHOLD = int(os.getenv("HEXBIN_THRESHOLD", "50000"))
+
+def _t_critical(dof: int, z: float = 1.959964) -> float:
+    """
+    Two-sided 95% Student t critical value (Cornish-Fisher expansion, no scipy needed).
+    """
+    if dof <= 0:
+        return float('nan')
+    # The expansion is poor for very small samples, so use exact values there
+    small_dof = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776}
+    if dof in small_dof:
+        return small_dof[dof]
+    return (z + (z**3 + z) / (4 * dof) + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * dof**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * dof**3))
+
+def fit_ols_band(x: np.ndarray, y: np.ndarray, grid_size: int = 100):
+    """
+    Closed-form OLS fit with an analytic 95% confidence band for the mean response.
+    Returns (grid, fitted line, lower band, upper band, slope, intercept).
+    """
+    n = len(x)
+    x_mean, y_mean = x.mean(), y.mean()
+    sxx = np.sum((x - x_mean) ** 2)
+    slope = np.sum((x - x_mean) * (y - y_mean)) / sxx if sxx > 0 else 0.0
+    intercept = y_mean - slope * x_mean
+
+    grid = np.linspace(x.min(), x.max(), grid_size)
+    line = intercept + slope * grid
+    if n > 2 and sxx > 0:
+        residual_se = np.sqrt(np.sum((y - (intercept + slope * x)) ** 2) / (n - 2))
+        half_width = _t_critical(n - 2) * residual_se * np.sqrt(1 / n + (grid - x_mean) ** 2 / sxx)
+    else:
+        half_width = np.zeros_like(grid)
+    return grid, line, line - half_width, line + half_width, slope, intercept
+
+def generate_regression_plot_base64(df: pd.DataFrame, x_col: str, y_col: str, title: str = None,
+                                    regression_line: bool = True, hexbin_threshold: int = HEXBIN_THRESHOLD) -> str:
+    """
+    Scatterplot with a dashed red OLS regression line and confidence band, as a base64 PNG data URI.
+    Replaces seaborn's bootstrapped regplot with a closed-form fit; very large inputs are drawn as a hexbin.
+    """
+    data = df[[x_col, y_col]].apply(pd.to_numeric, errors='coerce').dropna()
+    x = data[x_col].to_numpy(dtype=float)
+    y = data[y_col].to_numpy(dtype=float)
+
     plt.figure(figsize=(8, 6))
-    sns.scatterplot(data=df, x=x_col, y=y_col)
-    if regression_line:
-        sns.regplot(data=df, x=x_col, y=y_col, scatter=False, color='red', line_kws={'linestyle': '--'})
-    plt.title(f'Plot of {y_col} vs. {x_col}')
+    if len(x) > hexbin_threshold:
+        plt.hexbin(x, y, gridsize=60, cmap='Blues', mincnt=1)
+        plt.colorbar(label='Count')
+    else:
+        plt.scatter(x, y, s=30, color='#1f77b4', edgecolors='white', linewidths=0.75)
+    if regression_line and len(x) >= 2:
+        grid, line, lower, upper, _, _ = fit_ols_band(x, y)
+        plt.fill_between(grid, lower, upper, color='red', alpha=0.15, linewidth=0)
+        plt.plot(grid, line, color='red', linestyle='--', linewidth=1.5)
+    plt.title(title or f'Plot of {y_col} vs. {x_col}')
     plt.xlabel(x_col)
     plt.ylabel(y_col)
     plt.grid(True)
     buf = io.BytesIO()
     plt.savefig(buf, format='png', bbox_inches='tight')
+    plt.close()
     buf.seek(0)
     image_base64 = base64.b64encode(buf.read()).decode('utf-8')
-    plt.close()
     return f"data:image/png;base64,{image_base64}"
 
+def generate_scatterplot_base64(df: pd.DataFrame, x_col: str, y_col: str, regression_line: bool = False) -> str:
+    """
+    Generate a scatterplot with optional regression line and return it as a base64 encoded PNG.
+    """
+    return generate_regression_plot_base64(df, x_col, y_col, regression_line=regression_line)
+
 
 # Add these functions to your utils.py
 
 def generate_sales_bar_chart(df: pd.DataFrame) -> str:
     """Generate sales bar chart with blue bars."""
+    return render_sales_bar_chart(df.groupby('Region')['Sales'].sum())
+
+def render_sales_bar_chart(sales_by_region: pd.Series) -> str:
+    """Draw the sales bar chart from precomputed per-region totals."""
     plt.figure(figsize=(10, 6))
     
-    sales_by_region = df.groupby('Region')['Sales'].sum()
     bars = plt.bar(sales_by_region.index, sales_by_region.values, color='blue', alpha=0.8, edgecolor='black', linewidth=0.5)
     
     # Ensure axes are visible and properly labeled
@@ -115,12 +272,14 @@ def generate_sales_bar_chart(df: pd.DataFrame) -> str:
 
 def generate_cumulative_sales_chart(df: pd.DataFrame) -> str:
     """Generate cumulative sales chart with red line."""
-    plt.figure(figsize=(10, 6))
-    
     df_sorted = df.sort_values('Date')
-    cumulative_sales = df_sorted['Sales'].cumsum()
+    return render_cumulative_sales_chart(df_sorted['Date'], df_sorted['Sales'].cumsum())
+
+def render_cumulative_sales_chart(dates, cumulative_sales) -> str:
+    """Draw the cumulative sales chart from a date-ordered cumulative series."""
+    plt.figure(figsize=(10, 6))
     
-    plt.plot(df_sorted['Date'], cumulative_sales, color='red', linewidth=2.5, marker='o', markersize=4)
+    plt.plot(dates, cumulative_sales, color='red', linewidth=2.5, marker='o', markersize=4)
     
     # Ensure axes are visible and properly labeled
     plt.xlabel('Date', fontsize=12, fontweight='bold')